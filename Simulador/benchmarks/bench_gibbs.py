@@ -0,0 +1,62 @@
+"""
+Benchmark del muestreador de Gibbs: evaluación simbólica (subs/evalf) frente a
+inversas compiladas con lambdify.
+
+Uso (desde la raíz del repositorio):
+    python Simulador/benchmarks/bench_gibbs.py [n_iteraciones]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from main import GibbsSampler, x, y, u  # noqa: E402
+
+EJEMPLOS = [
+    ("(2*x + 3*y + 2)/28", (0, 2), (0, 2)),
+    ("4*x*y", (0.1, 0.9), (0.1, 0.9)),
+    ("4*x*(1-y)", (0.1, 0.9), (0.1, 0.9)),
+]
+
+
+def medir(draw_x, draw_y, x_bounds, y_bounds, n):
+    current_y = (y_bounds[0] + y_bounds[1]) / 2
+    inicio = time.perf_counter()
+    for i in range(n):
+        u1 = (i + 0.5) / n
+        new_x = draw_x(current_y, u1)
+        current_y = min(max(draw_y(new_x, 1 - u1), y_bounds[0]), y_bounds[1])
+    return time.perf_counter() - inicio
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    sampler = GibbsSampler()
+    print(f"{'expresión':<22}{'simbólico (s)':>15}{'compilado (s)':>15}{'speedup':>10}")
+    for expr, x_bounds, y_bounds in EJEMPLOS:
+        with contextlib.redirect_stdout(io.StringIO()):
+            inv_x, inv_y = sampler.derive_inverses(expr, x_bounds, y_bounds)
+            punto_x = ((y_bounds[0] + y_bounds[1]) / 2, 0.5)
+            punto_y = ((x_bounds[0] + x_bounds[1]) / 2, 0.5)
+            comp_x, ok_x = sampler.compile_inverse(inv_x, y, punto_x)
+            comp_y, ok_y = sampler.compile_inverse(inv_y, x, punto_y)
+
+        def simb_x(c, v):
+            return float(inv_x.subs({y: c, u: v}).evalf())
+
+        def simb_y(c, v):
+            return float(inv_y.subs({x: c, u: v}).evalf())
+
+        # La evaluación simbólica es lenta: se mide con menos iteraciones y se extrapola
+        n_simb = max(n // 10, 1)
+        t_simb = medir(simb_x, simb_y, x_bounds, y_bounds, n_simb) * n / n_simb
+        t_comp = medir(comp_x, comp_y, x_bounds, y_bounds, n)
+        estado = "" if ok_x and ok_y else " (sin compilar)"
+        print(f"{expr:<22}{t_simb:>15.3f}{t_comp:>15.4f}{t_simb / t_comp:>9.0f}x{estado}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,38 @@
+// --- RESPUESTAS BINARIAS COLUMNARES ---
+// Pide las muestras como float64 crudos (application/octet-stream) y las
+// decodifica a Float64Array sin pasar por JSON. Formato del cuerpo:
+// [uint32 LE largo del JSON][JSON de metadatos][relleno a 8 bytes][columnas float64 LE]
+async function fetchColumnar(url, body) {
+    const response = await fetch(url, {
+        method: "POST",
+        headers: { "Content-Type": "application/json", "Accept": "application/octet-stream" },
+        body: JSON.stringify(body)
+    });
+    const contentType = response.headers.get("Content-Type") || "";
+    if (!contentType.startsWith("application/octet-stream")) {
+        return response.json();
+    }
+    return decodificarColumnas(await response.arrayBuffer());
+}
+
+function decodificarColumnas(buffer) {
+    const view = new DataView(buffer);
+    const largoCabecera = view.getUint32(0, true);
+    const metadatos = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, largoCabecera)));
+    let offset = Math.ceil((4 + largoCabecera) / 8) * 8;
+    const littleEndian = new Uint8Array(new Uint16Array([1]).buffer)[0] === 1;
+    const resultado = { ...metadatos };
+    metadatos.columnas.forEach(nombre => {
+        if (littleEndian) {
+            resultado[nombre] = new Float64Array(buffer, offset, metadatos.filas);
+        } else {
+            resultado[nombre] = Float64Array.from({ length: metadatos.filas }, (_, i) => view.getFloat64(offset + i * 8, true));
+        }
+        offset += metadatos.filas * 8;
+    });
+    return resultado;
+}
+
 // CÓDIGO CORREGIDO Y UNIFICADO EN UN SOLO BLOQUE DOMContentLoaded
 document.addEventListener('DOMContentLoaded', function() {
     // Referencias a elementos del DOM
@@ -113,7 +148,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 const stats = data.estadisticas;
                 html += `<div class="stat-card"><div class="stat-value">${stats.media.toFixed(4)}</div><div class="stat-label">Media</div></div><div class="stat-card"><div class="stat-value">${stats.desviacion_estandar.toFixed(4)}</div><div class="stat-label">Desv. Est.</div></div><div class="stat-card"><div class="stat-value">${stats.minimo.toFixed(4)}</div><div class="stat-label">Mínimo</div></div><div class="stat-card"><div class="stat-value">${stats.maximo.toFixed(4)}</div><div class="stat-label">Máximo</div></div>`;
                 const resultados = data.resultados_individuales || data.valores;
-                primerosResultadosHtml = `<p><strong>Primeros 10 resultados:</strong> ${resultados.slice(0, 10).map(v => v.toFixed(3)).join(", ")}</p>`;
+                primerosResultadosHtml = `<p><strong>Primeros 10 resultados:</strong> ${Array.from(resultados.slice(0, 10), v => v.toFixed(3)).join(", ")}</p>`;
                 break;
             case 'gibbs':
     // CORRECCIÓN: Se accede a los objetos anidados de forma segura
@@ -142,8 +177,8 @@ document.addEventListener('DOMContentLoaded', function() {
             case 'normal-bivariada':
                 const obs = data.estadisticas_observadas;
                 html += `<div class="stat-card"><div class="stat-value">${obs.media_x.toFixed(4)}</div><div class="stat-label">Media X Obs.</div></div><div class="stat-card"><div class="stat-value">${obs.sigma_x.toFixed(4)}</div><div class="stat-label">Desv. X Obs.</div></div><div class="stat-card"><div class="stat-value">${obs.media_y.toFixed(4)}</div><div class="stat-label">Media Y Obs.</div></div><div class="stat-card"><div class="stat-value">${obs.sigma_y.toFixed(4)}</div><div class="stat-label">Desv. Y Obs.</div></div><div class="stat-card" style="grid-column: span 2;"><div class="stat-value">${obs.rho.toFixed(4)}</div><div class="stat-label">Correlación Obs.</div></div>`;
-                const primerosXBiv = data.valores_x.slice(0, 10).map(v => v.toFixed(2)).join(', ');
-                const primerosYBiv = data.valores_y.slice(0, 10).map(v => v.toFixed(2)).join(', ');
+                const primerosXBiv = Array.from(data.valores_x.slice(0, 10), v => v.toFixed(2)).join(', ');
+                const primerosYBiv = Array.from(data.valores_y.slice(0, 10), v => v.toFixed(2)).join(', ');
                 primerosResultadosHtml = `<p><strong>Primeros 10 X:</strong> ${primerosXBiv}<br><strong>Primeros 10 Y:</strong> ${primerosYBiv}</p>`;
                 break;
             default:
@@ -179,7 +214,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Verificamos que realmente obtuvimos los arrays antes de procesarlos
             if (x_vals && y_vals) {
-                csvContent = 'x,y\n' + x_vals.map((val, i) => `${val},${y_vals[i]}`).join('\n');
+                csvContent = 'x,y\n' + Array.from(x_vals, (val, i) => `${val},${y_vals[i]}`).join('\n');
             } else {
                 alert('Error: No se encontraron datos de muestra para exportar.');
                 return; // Detenemos la función si no hay datos
@@ -327,13 +362,12 @@ document.addEventListener('DOMContentLoaded', function() {
             }
             mainChart.innerHTML = '<div class="chart-placeholder">🔄 Generando simulación...</div>';
             try {
-                const response = await fetch("/exponencial", { method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify({ num_experimentos: numExp, tasa: lambda }) });
-                const result = await response.json();
+                const result = await fetchColumnar("/exponencial", { num_experimentos: numExp, tasa: lambda });
                 datosSimulacionActual = result;
                 nombreSimulacionActual = 'exponencial';
                 mostrarResultados(nombreSimulacionActual, result);
                 const hist = { x: result.valores, type: 'histogram', histnorm: 'probability density', name: 'Simulación', marker: { color: '#6c5ce7', opacity: 0.7 }};
-                const maxX = Math.max(...result.valores);
+                const maxX = result.estadisticas.maximo;
                 const xTeorico = Array.from({length: 101}, (_, i) => i * maxX / 100);
                 const yTeorico = xTeorico.map(x => lambda * Math.exp(-lambda * x));
                 const traceTeorico = { x: xTeorico, y: yTeorico, type: 'scatter', mode: 'lines', name: 'Teórica', line: { color: '#e74c3c', width: 2.5 }};
@@ -364,13 +398,12 @@ document.addEventListener('DOMContentLoaded', function() {
             
             mainChart.innerHTML = '<div class="chart-placeholder">🔄 Generando simulación...</div>';
             try {
-                const response = await fetch("/normal", { method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify({ num_experimentos: numExp, media: mu, desviacion_estandar: sigma }) });
-                const result = await response.json();
+                const result = await fetchColumnar("/normal", { num_experimentos: numExp, media: mu, desviacion_estandar: sigma });
                 datosSimulacionActual = result;
                 nombreSimulacionActual = 'normal';
                 mostrarResultados(nombreSimulacionActual, result);
                 const hist = { x: result.valores, type: 'histogram', histnorm: 'probability density', name: 'Simulación', marker: { color: '#6c5ce7', opacity: 0.7 }};
-                const minX = Math.min(...result.valores), maxX = Math.max(...result.valores);
+                const minX = result.estadisticas.minimo, maxX = result.estadisticas.maximo;
                 const xTeorico = Array.from({length: 201}, (_, i) => minX + i * (maxX-minX) / 200);
                 const yTeorico = xTeorico.map(x => (1 / (sigma * Math.sqrt(2 * Math.PI))) * Math.exp(-0.5 * Math.pow((x - mu) / sigma, 2)));
                 const traceTeorico = { x: xTeorico, y: yTeorico, type: 'scatter', mode: 'lines', name: 'Teórica', line: { color: '#e74c3c', width: 2.5 }};
@@ -533,8 +566,7 @@ document.addEventListener('DOMContentLoaded', function() {
             secondaryChart.style.display = 'block';
             secondaryChart.innerHTML = '<div class="chart-placeholder">🔄 Generando gráfico 2D...</div>';
             try {
-                const response = await fetch("/normal_bivariada", { method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify(params) });
-                const result = await response.json();
+                const result = await fetchColumnar("/normal_bivariada", params);
                 if (result.error) throw new Error(result.error);
                 datosSimulacionActual = result;
                 nombreSimulacionActual = 'normal-bivariada';
@@ -774,13 +806,22 @@ document.addEventListener('DOMContentLoaded', function() {
         const data = await response.json();
         window.ultimoCalculo = { n_experimentos, categorias, probabilidades, frecuencias_deseadas };
 
+        // Los valores que no caben en un float llegan como null; se muestra su texto en escala log
+        const mostrar = (clave, digitos) => {
+          const valor = data[clave];
+          return (valor !== null && valor > 0) ? valor.toExponential(digitos) : data.textos[clave];
+        };
+        const unoEn = data.interpretacion.uno_en !== null
+          ? data.interpretacion.uno_en.toLocaleString()
+          : data.interpretacion.uno_en_texto;
+
         const resultadosDiv = document.getElementById('resultados-prob');
         resultadosDiv.innerHTML = `
           <div class="summary-card">
             <h3 style="margin-bottom: 1rem; color: #333;">🎯 Probabilidad Calculada</h3>
             <div style="text-align: center; padding: 2rem; background: white; border-radius: 10px; margin-top: 1rem;">
               <div style="font-size: 3rem; font-weight: 700; color: #667eea; margin-bottom: 0.5rem;">
-                ${(data.probabilidad_exacta * 100).toExponential(4)}%
+                ${data.probabilidad_exacta > 0 ? (data.probabilidad_exacta * 100).toExponential(4) + '%' : data.textos.probabilidad_exacta}
               </div>
               <div style="font-size: 1.2rem; color: #666;">
                 Probabilidad Exacta
@@ -788,7 +829,7 @@ document.addEventListener('DOMContentLoaded', function() {
               <div style="margin-top: 1rem; padding: 1rem; background: #f8f9ff; border-radius: 8px;">
                 <strong style="color: #f39c12;">${data.interpretacion.rareza.toUpperCase()}</strong>
                 <br>
-                Aproximadamente 1 en ${data.interpretacion.uno_en.toLocaleString()} casos
+                Aproximadamente 1 en ${unoEn} casos
               </div>
             </div>
           </div>
@@ -812,7 +853,7 @@ document.addEventListener('DOMContentLoaded', function() {
             <div class="step">
               <strong>Paso 1: Coeficiente Multinomial</strong>
               <div class="formula">
-                n! / (${frecuencias_deseadas.join('! × ')}!) = ${data.coeficiente_multinomial.toExponential(4)}
+                n! / (${frecuencias_deseadas.join('! × ')}!) = ${mostrar('coeficiente_multinomial', 4)}
               </div>
               <p style="margin-top: 0.5rem; color: #666; font-size: 0.9rem;">
                 Este número representa las formas posibles de ordenar los resultados
@@ -827,14 +868,14 @@ document.addEventListener('DOMContentLoaded', function() {
                 </div>
               `).join('')}
               <div class="formula" style="margin-top: 1rem;">
-                Producto Total = ${data.producto_probabilidades.toExponential(6)}
+                Producto Total = ${mostrar('producto_probabilidades', 6)}
               </div>
             </div>
 
             <div class="step">
               <strong>Paso 3: Resultado Final</strong>
               <div class="formula">
-                ${data.coeficiente_multinomial.toExponential(4)} × ${data.producto_probabilidades.toExponential(6)} = ${data.probabilidad_exacta.toExponential(6)}
+                ${mostrar('coeficiente_multinomial', 4)} × ${mostrar('producto_probabilidades', 6)} = ${mostrar('probabilidad_exacta', 6)}
               </div>
             </div>
 
@@ -871,7 +912,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 <td style="padding: 1rem;" colspan="2">TOTAL</td>
                 <td style="padding: 1rem; text-align: center;">${frecuencias_deseadas.reduce((a,b) => a+b, 0)}</td>
                 <td style="padding: 1rem; text-align: center;">${data.frecuencias_esperadas.reduce((a,b) => a+b, 0).toFixed(2)}</td>
-                <td style="padding: 1rem; text-align: center; font-family: monospace;">${data.producto_probabilidades.toExponential(3)}</td>
+                <td style="padding: 1rem; text-align: center; font-family: monospace;">${mostrar('producto_probabilidades', 3)}</td>
               </tr>
             </tbody>
           </table>
@@ -2368,7 +2409,8 @@ window.cargarEjemploMetropolis = function() {
     // Guardar configuración actual
     currentMetropolisConfig = {
         target_type: example.target_type,
-        params: {...example.params}
+        params: {...example.params},
+        boundary: example.boundary || 'clamp'
     };
     
     // Mensaje de éxito
@@ -2413,7 +2455,8 @@ window.ejecutarMetropolisHastings = async function() {
             x_initial: parseFloat(document.getElementById('metropolis-x-initial').value),
             proposal_sigma: parseFloat(document.getElementById('metropolis-proposal-sigma').value),
             x_min: parseFloat(document.getElementById('metropolis-x-min').value),
-            x_max: parseFloat(document.getElementById('metropolis-x-max').value)
+            x_max: parseFloat(document.getElementById('metropolis-x-max').value),
+            boundary: currentMetropolisConfig.boundary || 'clamp'
         };
         
         // Validaciones
@@ -0,0 +1,31 @@
+"""
+Validación de expresiones objetivo de Metropolis-Hastings.
+
+Uso (desde la raíz del repositorio):
+    python -m pytest Simulador/tests
+"""
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from main import compile_expression_target, parse_target_expression  # noqa: E402
+
+
+@pytest.mark.parametrize("expression", ["exp(-x**2/2e0)", "exp(-x/1e-3)", "exp(-x**2/(2*1.5E+0**2))"])
+def test_notacion_cientifica(expression):
+    parse_target_expression(expression, {})
+
+
+def test_notacion_cientifica_log_densidad():
+    target = compile_expression_target("exp(-x**2/2e0)", {})
+    assert math.isclose(target.logpdf_scalar(2.0), -2.0)
+
+
+@pytest.mark.parametrize("expression", ["exp(-x/e0)", "2exec(1)", "os*x", "(x"])
+def test_nombres_no_permitidos(expression):
+    with pytest.raises(ValueError):
+        parse_target_expression(expression, {})